@@ -2,8 +2,9 @@
 import customtkinter as ctk
 import json
 import os
-from robo import check_api_key, get_channel_info, get_video_ids, get_video_details
-from robo import get_video_comments, save_video_content, generate_channel_analysis
+from robo import check_api_key, get_channel_info, get_video_ids, get_videos_details, select_videos
+from robo import get_video_comments, get_transcript, generate_channel_analysis, VideoWriter
+from robo import save_video_snapshots, ProgressMetrics
 
 class App(ctk.CTk):
     def __init__(self):
@@ -55,6 +56,21 @@ class App(ctk.CTk):
                                             variable=self.comments_var)
         self.comments_check.pack(pady=5)
         
+        # Prioridade e limite de vídeos
+        self.order_label = ctk.CTkLabel(self.options_frame, text="Processar primeiro:")
+        self.order_label.pack(pady=5)
+        
+        self.order_options = {"Ordem do canal": None, "Mais vistos": "views", "Mais recentes": "recentes"}
+        self.order_var = ctk.StringVar(value=self.settings.get('order', "Ordem do canal"))
+        self.order_menu = ctk.CTkOptionMenu(self.options_frame,
+                                            values=list(self.order_options),
+                                            variable=self.order_var)
+        self.order_menu.pack(pady=5)
+        
+        self.max_videos_entry = ctk.CTkEntry(self.options_frame, width=200,
+                                             placeholder_text="Máximo de vídeos (opcional)")
+        self.max_videos_entry.pack(pady=5)
+        
         # Botão Processar
         self.process_button = ctk.CTkButton(self.main_frame, 
                                           text="Processar Canal",
@@ -66,6 +82,10 @@ class App(ctk.CTk):
         self.progress_bar.pack(pady=10, fill="x")
         self.progress_bar.set(0)
         
+        # Vazão, ETA e etapas em andamento
+        self.metrics_label = ctk.CTkLabel(self.main_frame, text="", wraplength=540)
+        self.metrics_label.pack(pady=5)
+        
         # Log de Status
         self.status_text = ctk.CTkTextbox(self.main_frame, height=300)
         self.status_text.pack(pady=10, fill="both", expand=True)
@@ -83,7 +103,8 @@ class App(ctk.CTk):
         settings = {
             'api_key': self.api_entry.get(),
             'include_description': self.desc_var.get(),
-            'include_comments': self.comments_var.get()
+            'include_comments': self.comments_var.get(),
+            'order': self.order_var.get()
         }
         try:
             with open('settings.json', 'w') as f:
@@ -96,6 +117,10 @@ class App(ctk.CTk):
         self.status_text.see("end")
         self.update()
     
+    def show_metrics(self, metrics):
+        self.metrics_label.configure(text=metrics.format_summary())
+        self.update()
+    
     def process_channel(self):
         # Validações
         api_key = self.api_entry.get()
@@ -108,6 +133,11 @@ class App(ctk.CTk):
             self.log_status("❌ Erro: Insira a URL do canal!")
             return
         
+        max_videos = self.max_videos_entry.get().strip()
+        if max_videos and not (max_videos.isdecimal() and int(max_videos) > 0):
+            self.log_status("❌ Erro: O máximo de vídeos deve ser um número inteiro maior que zero!")
+            return
+        
         # Desabilita botão durante processamento
         self.process_button.configure(state="disabled")
         self.progress_bar.set(0)
@@ -133,14 +163,31 @@ class App(ctk.CTk):
             
             # Obtém lista de vídeos
             self.log_status("📚 Obtendo lista de vídeos...")
-            videos = get_video_ids(youtube, channel_id)
+            metrics = ProgressMetrics(0)
+            with metrics.stage('listagem'):
+                video_ids = get_video_ids(youtube, channel_id, metrics=metrics)
+            with metrics.stage('detalhes'):
+                fetched_details = get_videos_details(youtube, video_ids, metrics=metrics)
+            
+            if not fetched_details:
+                self.log_status("❌ Não foi possível obter a lista ou os detalhes dos vídeos!")
+                return
+            
+            # Registra snapshot de todos os vídeos listados
+            save_video_snapshots(fetched_details, output_dir)
+            
+            videos = select_videos(
+                fetched_details,
+                order_by=self.order_options.get(self.order_var.get()),
+                max_videos=int(max_videos) if max_videos else None
+            )
             total_videos = len(videos)
             
             if not videos:
                 self.log_status("❌ Nenhum vídeo encontrado!")
                 return
                 
-            self.log_status(f"🎥 Total de vídeos encontrados: {total_videos}")
+            self.log_status(f"🎥 Total de vídeos encontrados: {len(fetched_details)} (processando {total_videos})")
             
             # Processa vídeos
             all_video_details = []
@@ -148,42 +195,56 @@ class App(ctk.CTk):
             sucessos_sem_transcricao = 0
             falhas = 0
             
-            for i, video_id in enumerate(videos):
+            metrics.set_total(total_videos)
+            writer = VideoWriter(output_dir, self.desc_var.get(), self.comments_var.get(), metrics=metrics)
+            
+            for i, video_details in enumerate(videos):
+                video_id = video_details['video_id']
+                metrics.emit('video_started', video_id=video_id)
                 try:
                     progress = (i + 1) / total_videos
                     self.progress_bar.set(progress)
                     self.log_status(f"🎬 Processando vídeo {i+1} de {total_videos}")
                     
-                    video_details = get_video_details(youtube, video_id)
-                    if video_details:
-                        all_video_details.append(video_details)
-                        
-                        comments = []
-                        if self.comments_var.get():
-                            comments = get_video_comments(youtube, video_id)
-                        
-                        success, _, status = save_video_content(
-                            video_id,
-                            video_details,
-                            comments,
-                            output_dir,
-                            self.desc_var.get(),
-                            self.comments_var.get()
-                        )
-                        
-                        if success:
-                            if status == "Com Transcrição":
-                                sucessos_com_transcricao += 1
-                            else:
-                                sucessos_sem_transcricao += 1
-                        else:
-                            falhas += 1
+                    all_video_details.append(video_details)
+                    
+                    comments = []
+                    if self.comments_var.get():
+                        with metrics.stage('comentarios', video_id=video_id):
+                            self.show_metrics(metrics)
+                            comments = get_video_comments(youtube, video_id, metrics=metrics)
+                    
+                    with metrics.stage('transcricao', video_id=video_id):
+                        self.show_metrics(metrics)
+                        transcript_data = get_transcript(video_id, metrics=metrics)
+                    writer.submit(video_id, video_details, transcript_data, comments)
                             
                 except Exception as e:
                     falhas += 1
+                    metrics.emit('video_finished', video_id=video_id, success=False)
                     self.log_status(f"❌ Erro no vídeo: {str(e)}")
                 
-                self.update()
+                for _, failed_details, success, error, _ in writer.poll_results():
+                    if not success:
+                        self.log_status(f"❌ Erro ao gravar {failed_details['title']}: {error}")
+                
+                self.show_metrics(metrics)
+            
+            self.log_status("💾 Finalizando gravação dos arquivos...")
+            results = writer.close()
+            for _, failed_details, success, error, _ in writer.poll_results():
+                if not success:
+                    self.log_status(f"❌ Erro ao gravar {failed_details['title']}: {error}")
+            
+            for _, _, success, _, status in results:
+                if success:
+                    if status == "Com Transcrição":
+                        sucessos_com_transcricao += 1
+                    else:
+                        sucessos_sem_transcricao += 1
+                else:
+                    falhas += 1
+            self.show_metrics(metrics)
             
             # Gera análise
             self.log_status("\n📊 Gerando análise detalhada...")
@@ -203,6 +264,13 @@ class App(ctk.CTk):
             self.log_status(f"Sem transcrição: {sucessos_sem_transcricao}")
             self.log_status(f"Falhas: {falhas}")
             
+            snap = metrics.snapshot()
+            self.log_status(f"Vazão: {snap['videos_per_minute']:.1f} vídeos/min")
+            for stage, info in sorted(snap['stages'].items(), key=lambda item: -item[1]['seconds']):
+                self.log_status(f"⏱️ {stage}: {info['average']:.2f}s por execução ({info['runs']} execuções)")
+            for error_type, quantidade in snap['errors'].items():
+                self.log_status(f"⚠️ {error_type}: {quantidade}")
+            
             self.log_status(f"\nArquivos salvos em: {output_dir}")
             
         except Exception as e:
@@ -9,6 +9,26 @@ import time
 import re
 import sys
 import json
+import argparse
+import itertools
+import sqlite3
+import tempfile
+import threading
+import queue
+import hashlib
+import gzip
+import zlib
+from collections import Counter
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+try:
+    import numpy as np
+except ImportError:
+    np = None
+try:
+    import zstandard as zstd
+except ImportError:
+    zstd = None
 BASE_SAVE_DIR = "dist/MeusSalvamentos"
 
 def check_api_key(api_key):
@@ -51,7 +71,7 @@ def get_channel_info(youtube, channel_url):
         print(f"Erro ao obter informações do canal: {str(e)}")
         sys.exit(1)
 
-def get_video_ids(youtube, channel_id):
+def get_video_ids(youtube, channel_id, metrics=None):
     """Obtém lista de IDs dos vídeos usando a playlist de uploads do canal."""
     try:
         request = youtube.channels().list(
@@ -92,33 +112,136 @@ def get_video_ids(youtube, channel_id):
         return video_ids
     except Exception as e:
         print(f"Erro ao obter lista de vídeos: {str(e)}")
+        if metrics:
+            metrics.error('listagem', e)
         return []
 
+def parse_video_item(video):
+    """Converte um item de youtube.videos().list no dicionário de detalhes."""
+    snippet = video['snippet']
+    statistics = video['statistics']
+    
+    return {
+        'video_id': video['id'],
+        'title': snippet['title'],
+        'description': snippet['description'],
+        'publish_date': snippet['publishedAt'].split('T')[0],
+        'views': statistics.get('viewCount', '0'),
+        'likes': statistics.get('likeCount', '0'),
+        'comments_count': statistics.get('commentCount', '0'),
+        'duration': parse_duration(video.get('contentDetails', {}).get('duration', ''))
+    }
+
+def parse_duration(duration):
+    """Converte uma duração ISO 8601 (ex.: PT1H2M3S) em segundos."""
+    match = re.match(r'P(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?$', duration or '')
+    if not match:
+        return 0
+    days, hours, minutes, seconds = (int(g) if g else 0 for g in match.groups())
+    return ((days * 24 + hours) * 60 + minutes) * 60 + seconds
+
 def get_video_details(youtube, video_id):
     """Obtém detalhes do vídeo."""
     try:
         video_response = youtube.videos().list(
-            part='snippet,statistics',
+            part='snippet,statistics,contentDetails',
             id=video_id
         ).execute()
         
-        video = video_response['items'][0]
-        snippet = video['snippet']
-        statistics = video['statistics']
-        
-        return {
-            'title': snippet['title'],
-            'description': snippet['description'],
-            'publish_date': snippet['publishedAt'].split('T')[0],
-            'views': statistics.get('viewCount', '0'),
-            'likes': statistics.get('likeCount', '0'),
-            'comments_count': statistics.get('commentCount', '0')
-        }
+        return parse_video_item(video_response['items'][0])
     except Exception as e:
         print(f"Erro ao obter detalhes do vídeo: {str(e)}")
         return None
 
-def get_video_comments(youtube, video_id, max_comments=100):
+def get_videos_details(youtube, video_ids, metrics=None):
+    """Obtém detalhes de vários vídeos em lotes de 50 (1 unidade de cota por lote)."""
+    details = {}
+    print("\nObtendo detalhes dos vídeos...")
+    for i in range(0, len(video_ids), 50):
+        batch = video_ids[i:i + 50]
+        try:
+            response = youtube.videos().list(
+                part='snippet,statistics,contentDetails',
+                id=','.join(batch),
+                maxResults=50
+            ).execute()
+        except Exception as e:
+            print(f"Erro ao obter detalhes dos vídeos: {str(e)}")
+            if metrics:
+                metrics.error('detalhes', e)
+            response = {'items': []}
+        
+        # Um item malformado não descarta o restante do lote
+        for item in response['items']:
+            try:
+                details[item['id']] = parse_video_item(item)
+            except Exception as e:
+                print(f"Erro ao ler detalhes do vídeo {item.get('id')}: {str(e)}")
+                if metrics:
+                    metrics.error('detalhes', e)
+        
+        time.sleep(0.5)
+    
+    return [details[video_id] for video_id in video_ids if video_id in details]
+
+SHORTS_MAX_SECONDS = 180
+
+# Custo de cota da API por vídeo na etapa de comentários (até 5 páginas de commentThreads)
+COMMENTS_QUOTA_COST = 5
+
+def select_videos(video_details_list, date_from=None, date_to=None, min_views=None,
+                  min_duration=None, max_duration=None, shorts=None, title_regex=None,
+                  order_by=None, max_videos=None):
+    """Filtra e ordena os vídeos antes das etapas caras (comentários e transcrições).
+
+    shorts: 'apenas' mantém só shorts, 'excluir' remove os shorts.
+    order_by: 'views' (mais vistos primeiro) ou 'recentes' (mais novos primeiro).
+    """
+    title_pattern = re.compile(title_regex, re.IGNORECASE) if title_regex else None
+    
+    selected = []
+    for video in video_details_list:
+        if date_from and video['publish_date'] < date_from:
+            continue
+        if date_to and video['publish_date'] > date_to:
+            continue
+        if min_views is not None and int(video['views']) < min_views:
+            continue
+        if min_duration is not None and video['duration'] < min_duration:
+            continue
+        if max_duration is not None and video['duration'] > max_duration:
+            continue
+        is_short = 0 < video['duration'] <= SHORTS_MAX_SECONDS
+        if shorts == 'apenas' and not is_short:
+            continue
+        if shorts == 'excluir' and is_short:
+            continue
+        if title_pattern and not title_pattern.search(video['title']):
+            continue
+        selected.append(video)
+    
+    if order_by == 'views':
+        selected.sort(key=lambda v: int(v['views']), reverse=True)
+    elif order_by == 'recentes':
+        selected.sort(key=lambda v: v['publish_date'], reverse=True)
+    
+    if max_videos is not None:
+        selected = selected[:max_videos]
+    
+    return selected
+
+def videos_within_quota(quota, total_listed, include_comments):
+    """Calcula quantos vídeos cabem na cota restante após listagem e detalhes.
+
+    Retorna None quando não há limite (sem cota ou sem etapa de comentários).
+    """
+    if quota is None or not include_comments:
+        return None
+    pages = -(-total_listed // 50)
+    spent = 3 + 2 * pages  # verificação da chave, canal e uploads + páginas da playlist e lotes de detalhes
+    return max(0, (quota - spent) // COMMENTS_QUOTA_COST)
+
+def get_video_comments(youtube, video_id, max_comments=100, metrics=None):
     """Obtém os top comentários ordenados por likes."""
     try:
         all_comments = []
@@ -151,6 +274,8 @@ def get_video_comments(youtube, video_id, max_comments=100):
                     
             except Exception as e:
                 print(f"Erro ao obter página de comentários: {str(e)}")
+                if metrics:
+                    metrics.error('comentarios', e)
                 break
         
         all_comments.sort(key=lambda x: x['likes'], reverse=True)
@@ -163,9 +288,11 @@ def get_video_comments(youtube, video_id, max_comments=100):
         
     except Exception as e:
         print(f"Erro ao obter comentários: {str(e)}")
+        if metrics:
+            metrics.error('comentarios', e)
         return []
 
-def get_transcript(video_id):
+def get_transcript(video_id, metrics=None):
     """Obtém a transcrição do vídeo."""
     try:
         transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
@@ -208,8 +335,119 @@ def get_transcript(video_id):
             return transcript.fetch()
         
         return None
-    except:
+    except (TranscriptsDisabled, NoTranscriptFound) as e:
+        # Vídeo sem legendas: resultado normal ("Sem Transcrição"), não um erro
+        if metrics:
+            metrics.emit('transcript_unavailable', video_id=video_id, reason=type(e).__name__)
         return None
+    except Exception as e:
+        if metrics:
+            metrics.error('transcricao', e)
+        return None
+
+def render_video_content(video_id, video_details, transcript_data, comments, include_description, include_comments):
+    """Monta todo o conteúdo do arquivo do vídeo em um único texto."""
+    parts = []
+
+    # Informações básicas
+    parts.append(f"Título: {video_details['title']}\n")
+    parts.append(f"URL: https://www.youtube.com/watch?v={video_id}\n")
+    parts.append(f"Data de Publicação: {video_details['publish_date']}\n")
+    parts.append(f"Visualizações: {video_details['views']}\n")
+    parts.append(f"Likes: {video_details['likes']}\n")
+    parts.append(f"Quantidade de Comentários: {video_details['comments_count']}\n\n")
+
+    # Descrição
+    if include_description:
+        parts.append("DESCRIÇÃO:\n")
+        parts.append(f"{video_details['description']}\n\n")
+
+    # Transcrição
+    if transcript_data:
+        parts.append("TRANSCRIÇÃO:\n")
+        seen_texts = set()
+
+        for entry in sorted(transcript_data, key=lambda x: x['start']):
+            text = entry['text'].strip()
+            if text and text not in seen_texts:
+                seen_texts.add(text)
+                start_time = int(entry['start'])
+                minutes = start_time // 60
+                seconds = start_time % 60
+                parts.append(f"[{minutes:02d}:{seconds:02d}] {text}\n")
+    else:
+        parts.append("TRANSCRIÇÃO: Não disponível para este vídeo\n\n")
+
+    # Comentários
+    if include_comments and comments:
+        parts.append("\nTOP 100 COMENTÁRIOS (Por número de likes):\n")
+        for comment in comments:
+            parts.append(f"\n#{comment['ranking']} - {comment['likes']} likes\n")
+            parts.append(f"Autor: {comment['author']}\n")
+            parts.append(f"Data: {comment['date']}\n")
+            parts.append(f"Comentário: {comment['text']}\n")
+            parts.append("-" * 50 + "\n")
+
+    return "".join(parts)
+
+def get_video_output_path(video_details, channel_folder, has_transcript):
+    """Retorna o status (pasta) e o caminho do arquivo do vídeo."""
+    status = "Com Transcrição" if has_transcript else "Sem Transcrição"
+    valid_title = "".join(c for c in video_details['title'] if c.isalnum() or c in (' ','-','_')).rstrip()
+    valid_title = valid_title[:150]
+    return status, os.path.join(channel_folder, status, f"{valid_title}.txt")
+
+# umask do processo, para que os arquivos temporários (criados com 0600 pelo
+# mkstemp) fiquem com as mesmas permissões que open() daria ao destino
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+def write_temp_file(path, content, fsync=False):
+    """Grava o conteúdo em um arquivo temporário ao lado do destino e retorna seu caminho."""
+    output_dir = os.path.dirname(path)
+    os.makedirs(output_dir, exist_ok=True)
+    try:
+        mode = os.stat(path).st_mode & 0o777
+    except OSError:
+        mode = 0o666 & ~_UMASK
+    fd, temp_path = tempfile.mkstemp(dir=output_dir, prefix=".", suffix=".tmp")
+    try:
+        if hasattr(os, 'fchmod'):
+            os.fchmod(fd, mode)
+        else:
+            os.chmod(temp_path, mode)
+        if isinstance(content, bytes):
+            f = os.fdopen(fd, 'wb')
+        else:
+            f = os.fdopen(fd, 'w', encoding='utf-8')
+        with f:
+            f.write(content)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    return temp_path
+
+def fsync_directory(path):
+    """Garante que as renomeações na pasta chegaram ao disco (ignorado no Windows)."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def write_file_atomic(path, content, fsync=False):
+    """Grava o arquivo de forma atômica: o destino nunca fica pela metade."""
+    os.replace(write_temp_file(path, content, fsync), path)
+    if fsync:
+        fsync_directory(os.path.dirname(path))
 
 def save_video_content(video_id, video_details, comments, channel_folder, include_description, include_comments):
     """Salva o conteúdo do vídeo em arquivo."""
@@ -217,60 +455,874 @@ def save_video_content(video_id, video_details, comments, channel_folder, includ
         # Obtém a transcrição
         transcript_data = get_transcript(video_id)
 
-        # Define a pasta de destino
-        output_dir = os.path.join(channel_folder, "Com Transcrição" if transcript_data else "Sem Transcrição")
-        os.makedirs(output_dir, exist_ok=True)
-        
-        # Prepara o nome do arquivo
-        valid_title = "".join(c for c in video_details['title'] if c.isalnum() or c in (' ','-','_')).rstrip()
-        valid_title = valid_title[:150]
-        output_file = os.path.join(output_dir, f"{valid_title}.txt")
-
-        with open(output_file, 'w', encoding='utf-8') as f:
-            # Informações básicas
-            f.write(f"Título: {video_details['title']}\n")
-            f.write(f"URL: https://www.youtube.com/watch?v={video_id}\n")
-            f.write(f"Data de Publicação: {video_details['publish_date']}\n")
-            f.write(f"Visualizações: {video_details['views']}\n")
-            f.write(f"Likes: {video_details['likes']}\n")
-            f.write(f"Quantidade de Comentários: {video_details['comments_count']}\n\n")
-
-            # Descrição
-            if include_description:
-                f.write("DESCRIÇÃO:\n")
-                f.write(f"{video_details['description']}\n\n")
-
-            # Transcrição
-            if transcript_data:
-                f.write("TRANSCRIÇÃO:\n")
-                transcript_data.sort(key=lambda x: x['start'])
-                seen_texts = set()
-                
-                for entry in transcript_data:
-                    text = entry['text'].strip()
-                    if text and text not in seen_texts:
-                        seen_texts.add(text)
-                        start_time = int(entry['start'])
-                        minutes = start_time // 60
-                        seconds = start_time % 60
-                        f.write(f"[{minutes:02d}:{seconds:02d}] {text}\n")
-            else:
-                f.write("TRANSCRIÇÃO: Não disponível para este vídeo\n\n")
+        status, output_file = get_video_output_path(video_details, channel_folder, bool(transcript_data))
+        content = render_video_content(video_id, video_details, transcript_data, comments, include_description, include_comments)
+        write_file_atomic(output_file, content)
 
-            # Comentários
-            if include_comments and comments:
-                f.write("\nTOP 100 COMENTÁRIOS (Por número de likes):\n")
-                for comment in comments:
-                    f.write(f"\n#{comment['ranking']} - {comment['likes']} likes\n")
-                    f.write(f"Autor: {comment['author']}\n")
-                    f.write(f"Data: {comment['date']}\n")
-                    f.write(f"Comentário: {comment['text']}\n")
-                    f.write("-" * 50 + "\n")
+        return True, "Sucesso", status
 
-        return True, "Sucesso", "Com Transcrição" if transcript_data else "Sem Transcrição"
-        
     except Exception as e:
         return False, str(e), None
+
+BLOB_STORE_DIR = "Transcrições.blobs"
+BLOB_INDEX_NAME = "index.sqlite3"
+
+# Fronteiras de bloco definidas pelo conteúdo: trechos repetidos em reuploads
+# e compilações caem nos mesmos blocos mesmo com deslocamento de segmentos.
+CHUNK_MIN_SEGMENTS = 32
+CHUNK_AVG_SEGMENTS = 128
+CHUNK_MAX_SEGMENTS = 512
+
+# Os blocos comprimidos são acrescentados a arquivos de pacote; um novo
+# pacote é iniciado quando o atual passa deste tamanho.
+PACK_MAX_BYTES = 256 * 1024 * 1024
+
+# Fração de bytes sem uso nos pacotes a partir da qual uma execução compacta o armazenamento
+BLOB_COMPACT_RATIO = 0.2
+
+def allocated_size(path):
+    """Espaço ocupado em disco pelo arquivo (blocos alocados, quando o sistema informa)."""
+    st = os.stat(path)
+    blocks = getattr(st, 'st_blocks', None)
+    return blocks * 512 if blocks is not None else st.st_size
+
+class TranscriptBlobStore:
+    """Armazena transcrições em blocos comprimidos e endereçados por conteúdo.
+
+    Os segmentos são divididos em blocos (texto, início relativo ao bloco e
+    duração), e cada bloco (zstd quando disponível, senão gzip) é acrescentado
+    uma única vez a um arquivo de pacote em packs/; o índice SQLite guarda
+    (pacote, posição, tamanho) de cada hash. O manifesto de cada vídeo só
+    lista os blocos e o início de cada um, então reexecuções e reuploads não
+    geram blobs novos. Detalhes e comentários, que mudam a cada execução,
+    ficam comprimidos na própria linha do vídeo no índice. compact remove dos
+    pacotes os blobs que nenhum manifesto usa. read_video e materialize
+    reconstroem o .txt original.
+    """
+
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        self.packs_dir = os.path.join(store_dir, "packs")
+        os.makedirs(self.packs_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(store_dir, BLOB_INDEX_NAME), check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS blobs (
+                digest TEXT PRIMARY KEY,
+                pack INTEGER NOT NULL,
+                offset INTEGER NOT NULL,
+                length INTEGER NOT NULL
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS transcripts (
+                video_id TEXT PRIMARY KEY,
+                manifest TEXT NOT NULL,
+                metadata BLOB NOT NULL,
+                stored_at INTEGER NOT NULL
+            );
+        """)
+        self._conn.commit()
+        self._pack_number = self._conn.execute("SELECT COALESCE(MAX(pack), 1) FROM blobs").fetchone()[0]
+        self._pack = None
+
+    @staticmethod
+    def exists(store_dir):
+        return os.path.exists(os.path.join(store_dir, BLOB_INDEX_NAME))
+
+    def close(self):
+        if self._pack:
+            self._pack.close()
+            self._pack = None
+        self._conn.close()
+
+    @staticmethod
+    def _compress(data):
+        if zstd is not None:
+            return zstd.ZstdCompressor(level=10).compress(data)
+        return gzip.compress(data, compresslevel=9, mtime=0)
+
+    @staticmethod
+    def _decompress(compressed):
+        """Descomprime detectando zstd ou gzip pelo cabeçalho."""
+        if compressed[:4] == b'\x28\xb5\x2f\xfd':
+            if zstd is None:
+                raise RuntimeError("O pacote zstandard é necessário para ler este armazenamento")
+            return zstd.ZstdDecompressor().decompress(compressed)
+        return gzip.decompress(compressed)
+
+    def _pack_path(self, number):
+        return os.path.join(self.packs_dir, f"pack-{number:06d}.pack")
+
+    def _open_pack(self):
+        """Abre o pacote atual para acréscimo, passando ao próximo quando estiver cheio."""
+        if self._pack is None:
+            self._pack = open(self._pack_path(self._pack_number), 'ab')
+        if self._pack.tell() >= PACK_MAX_BYTES:
+            self._pack.close()
+            self._pack_number += 1
+            self._pack = open(self._pack_path(self._pack_number), 'ab')
+        return self._pack
+
+    def _put_blob(self, data):
+        """Acrescenta os bytes comprimidos ao pacote (se ainda não existirem) e retorna o hash.
+
+        Deve ser chamado com o lock e dentro da transação do índice.
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        if self._conn.execute("SELECT 1 FROM blobs WHERE digest = ?", (digest,)).fetchone():
+            return digest
+        compressed = self._compress(data)
+        pack = self._open_pack()
+        offset = pack.tell()
+        pack.write(compressed)
+        self._conn.execute(
+            "INSERT INTO blobs VALUES (?, ?, ?, ?)",
+            (digest, self._pack_number, offset, len(compressed))
+        )
+        return digest
+
+    def _read_blob(self, digest):
+        """Lê um blob sem descomprimir. Deve ser chamado com o lock."""
+        row = self._conn.execute("SELECT pack, offset, length FROM blobs WHERE digest = ?", (digest,)).fetchone()
+        if not row:
+            raise KeyError(f"Blob não encontrado: {digest}")
+        if self._pack:
+            self._pack.flush()
+        pack, offset, length = row
+        with open(self._pack_path(pack), 'rb') as f:
+            f.seek(offset)
+            return f.read(length)
+
+    def get_blob(self, digest):
+        """Lê e descomprime um blob."""
+        with self._lock:
+            compressed = self._read_blob(digest)
+        return self._decompress(compressed)
+
+    @staticmethod
+    def _split_chunks(segments):
+        """Divide os segmentos em blocos, com fronteiras definidas pelo texto."""
+        chunks = []
+        current = []
+        for entry in segments:
+            current.append(entry)
+            boundary = zlib.crc32(entry['text'].encode('utf-8')) % CHUNK_AVG_SEGMENTS == 0
+            if (boundary and len(current) >= CHUNK_MIN_SEGMENTS) or len(current) >= CHUNK_MAX_SEGMENTS:
+                chunks.append(current)
+                current = []
+        if current:
+            chunks.append(current)
+        return chunks
+
+    @staticmethod
+    def _encode_chunk(segments):
+        """Serializa um bloco com inícios relativos ao primeiro segmento.
+
+        Assim o mesmo trecho deslocado numa compilação gera o mesmo blob. Se a
+        conta relativa não reproduzir exatamente algum início, o bloco guarda
+        os inícios absolutos (base 0).
+        """
+        base = segments[0]['start']
+        starts = [round(entry['start'] - base, 3) for entry in segments]
+        if base == 0 or any(round(base + rel, 3) != entry['start'] for rel, entry in zip(starts, segments)):
+            base = 0
+            starts = [entry['start'] for entry in segments]
+        chunk = {
+            'text': [entry['text'] for entry in segments],
+            'start': starts,
+            'duration': [entry.get('duration', 0) for entry in segments]
+        }
+        return base, json.dumps(chunk, ensure_ascii=False, sort_keys=True).encode('utf-8')
+
+    def put_video(self, video_id, video_details, transcript_data, comments, include_description=True, include_comments=True):
+        """Guarda os segmentos brutos da transcrição e os dados do vídeo."""
+        segments = sorted(transcript_data or [], key=lambda x: x['start'])
+        encoded = [self._encode_chunk(chunk) for chunk in self._split_chunks(segments)]
+        metadata = self._compress(json.dumps({
+            'details': video_details,
+            'comments': comments,
+            'include_description': include_description,
+            'include_comments': include_comments
+        }, ensure_ascii=False).encode('utf-8'))
+
+        with self._lock, self._conn:
+            manifest = {
+                'has_transcript': bool(transcript_data),
+                'chunks': [[self._put_blob(data), base] for base, data in encoded]
+            }
+            digest = self._put_blob(json.dumps(manifest, sort_keys=True).encode('utf-8'))
+
+            # Os dados precisam estar no pacote antes de o índice apontar para eles
+            if self._pack:
+                self._pack.flush()
+                os.fsync(self._pack.fileno())
+            self._conn.execute(
+                "INSERT OR REPLACE INTO transcripts VALUES (?, ?, ?, ?)",
+                (video_id, digest, metadata, int(time.time()))
+            )
+        return digest
+
+    def video_ids(self):
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT video_id FROM transcripts ORDER BY video_id")]
+
+    def read_video(self, video_id):
+        """Retorna detalhes, comentários e opções do vídeo, com os segmentos reconstruídos em 'transcript'."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT manifest, metadata FROM transcripts WHERE video_id = ?", (video_id,)
+            ).fetchone()
+        if not row:
+            return None
+        manifest = json.loads(self.get_blob(row[0]))
+        video = json.loads(self._decompress(row[1]))
+
+        transcript = []
+        for digest, base in manifest['chunks']:
+            chunk = json.loads(self.get_blob(digest))
+            for text, start, duration in zip(chunk['text'], chunk['start'], chunk['duration']):
+                transcript.append({
+                    'text': text,
+                    'start': round(base + start, 3) if base else start,
+                    'duration': duration
+                })
+        video['has_transcript'] = manifest['has_transcript']
+        video['transcript'] = transcript if manifest['has_transcript'] else None
+        return video
+
+    def iter_videos(self):
+        """Percorre todos os vídeos armazenados, para análises em lote."""
+        for video_id in self.video_ids():
+            yield self.read_video(video_id)
+
+    def materialize(self, channel_folder, video_ids=None):
+        """Gera os arquivos .txt no formato de save_video_content a partir do armazenamento."""
+        if video_ids is None:
+            video_ids = self.video_ids()
+        total = 0
+        for video_id in video_ids:
+            video = self.read_video(video_id)
+            if not video:
+                continue
+            _, output_file = get_video_output_path(video['details'], channel_folder, video['has_transcript'])
+            content = render_video_content(
+                video_id,
+                video['details'],
+                video['transcript'],
+                video['comments'],
+                video['include_description'],
+                video['include_comments']
+            )
+            write_file_atomic(output_file, content)
+            total += 1
+        return total
+
+    def compact(self, min_dead_ratio=0.0):
+        """Reescreve os pacotes sem os blobs que nenhum manifesto usa.
+
+        Só age quando os bytes mortos passam de min_dead_ratio do total. Os
+        blobs vivos são copiados para pacotes novos, o índice é atualizado em
+        uma transação e só então os pacotes antigos são apagados.
+        Retorna (blobs removidos, bytes liberados).
+        """
+        with self._lock:
+            live = set()
+            for (digest,) in self._conn.execute("SELECT DISTINCT manifest FROM transcripts").fetchall():
+                live.add(digest)
+                manifest = json.loads(self._decompress(self._read_blob(digest)))
+                live.update(chunk_digest for chunk_digest, _ in manifest['chunks'])
+
+            rows = self._conn.execute("SELECT digest, pack, offset, length FROM blobs ORDER BY pack, offset").fetchall()
+            dead = [row for row in rows if row[0] not in live]
+            dead_bytes = sum(row[3] for row in dead)
+            total_bytes = sum(row[3] for row in rows)
+            if not dead or dead_bytes < min_dead_ratio * total_bytes:
+                return 0, 0
+
+            if self._pack:
+                self._pack.close()
+                self._pack = None
+            last_old_pack = self._pack_number
+            self._pack_number += 1
+
+            moved = []
+            sources = {}
+            try:
+                for digest, pack, offset, length in rows:
+                    if digest not in live:
+                        continue
+                    if pack not in sources:
+                        sources[pack] = open(self._pack_path(pack), 'rb')
+                    sources[pack].seek(offset)
+                    data = sources[pack].read(length)
+                    target = self._open_pack()
+                    moved.append((self._pack_number, target.tell(), digest))
+                    target.write(data)
+            finally:
+                for source in sources.values():
+                    source.close()
+            if self._pack:
+                self._pack.flush()
+                os.fsync(self._pack.fileno())
+
+            with self._conn:
+                self._conn.executemany("DELETE FROM blobs WHERE digest = ?", [(row[0],) for row in dead])
+                self._conn.executemany("UPDATE blobs SET pack = ?, offset = ? WHERE digest = ?", moved)
+
+            # Remove os pacotes antigos, incluindo restos de gravações interrompidas
+            for name in os.listdir(self.packs_dir):
+                match = re.match(r'pack-(\d+)\.pack$', name)
+                if match and int(match.group(1)) <= last_old_pack:
+                    os.remove(os.path.join(self.packs_dir, name))
+            return len(dead), dead_bytes
+
+    def disk_usage(self):
+        """Retorna (quantidade de blobs, bytes alocados em disco pelos pacotes e pelo índice)."""
+        with self._lock:
+            count = self._conn.execute("SELECT COUNT(*) FROM blobs").fetchone()[0]
+            if self._pack:
+                self._pack.flush()
+        size = 0
+        for name in os.listdir(self.packs_dir):
+            size += allocated_size(os.path.join(self.packs_dir, name))
+        for name in os.listdir(self.store_dir):
+            if name.startswith(BLOB_INDEX_NAME):
+                size += allocated_size(os.path.join(self.store_dir, name))
+        return count, size
+
+class ProgressMetrics:
+    """Eventos estruturados e métricas de progresso de uma execução.
+
+    Cada evento (video_started, video_finished, stage_started, stage_finished,
+    error) atualiza os contadores usados para vídeos/min, ETA, vídeos em
+    andamento por etapa e erros por tipo. Com event_log, os eventos também
+    são gravados em JSON Lines (inclusive os informativos, como
+    transcript_unavailable). É seguro usar a partir da thread de gravação.
+    """
+
+    # Etapas executadas uma vez antes dos vídeos; não entram no cálculo do gargalo
+    SETUP_STAGES = ('listagem', 'detalhes')
+
+    def __init__(self, total_videos, event_log=None):
+        self.total_videos = total_videos
+        self.started_at = time.time()
+        self.videos_started = 0
+        self.videos_finished = 0
+        self.videos_failed = 0
+        self.in_flight = Counter()
+        self.stage_seconds = Counter()
+        self.stage_runs = Counter()
+        self.errors = Counter()
+        self._lock = threading.Lock()
+        self._event_log = open(event_log, 'a', encoding='utf-8') if event_log else None
+
+    def set_total(self, total_videos):
+        """Define quantos vídeos serão processados e reinicia o relógio da vazão."""
+        with self._lock:
+            self.total_videos = total_videos
+            self.started_at = time.time()
+
+    def close(self):
+        if self._event_log:
+            self._event_log.close()
+            self._event_log = None
+
+    def emit(self, event, **fields):
+        """Registra um evento e atualiza as métricas agregadas."""
+        with self._lock:
+            if event == 'video_started':
+                self.videos_started += 1
+            elif event == 'video_finished':
+                self.videos_finished += 1
+                if not fields.get('success', True):
+                    self.videos_failed += 1
+            elif event == 'stage_started':
+                self.in_flight[fields['stage']] += 1
+            elif event == 'stage_finished':
+                self.in_flight[fields['stage']] -= 1
+                self.stage_seconds[fields['stage']] += fields['duration']
+                self.stage_runs[fields['stage']] += 1
+            elif event == 'error':
+                self.errors[(fields['stage'], fields['error_type'])] += 1
+
+            if self._event_log:
+                try:
+                    self._event_log.write(json.dumps({'time': time.time(), 'event': event, **fields}, ensure_ascii=False) + "\n")
+                    self._event_log.flush()
+                except OSError as e:
+                    # Uma falha no log (ex.: disco cheio) não pode interromper a coleta nem a gravação
+                    print(f"\nAviso: log de eventos desativado após erro de escrita: {e}")
+                    event_log, self._event_log = self._event_log, None
+                    try:
+                        event_log.close()
+                    except OSError:
+                        pass
+
+    def error(self, stage, exception):
+        """Registra um erro pelo tipo da exceção (e status HTTP, quando houver)."""
+        error_type = type(exception).__name__
+        status = getattr(getattr(exception, 'resp', None), 'status', None)
+        if status:
+            error_type = f"{error_type} {status}"
+        self.emit('error', stage=stage, error_type=error_type, message=str(exception))
+
+    @contextmanager
+    def stage(self, name, **fields):
+        """Mede a duração de uma etapa e a conta como em andamento enquanto roda."""
+        self.emit('stage_started', stage=name, **fields)
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            self.error(name, e)
+            raise
+        finally:
+            self.emit('stage_finished', stage=name, duration=time.perf_counter() - started, **fields)
+
+    def snapshot(self):
+        """Retorna as métricas atuais: vazão, ETA, etapas e erros."""
+        with self._lock:
+            elapsed = time.time() - self.started_at
+            rate = self.videos_finished / elapsed * 60 if elapsed > 0 else 0.0
+            remaining = max(self.total_videos - self.videos_finished, 0)
+            stages = {
+                stage: {
+                    'in_flight': self.in_flight[stage],
+                    'runs': self.stage_runs[stage],
+                    'seconds': self.stage_seconds[stage],
+                    'average': self.stage_seconds[stage] / self.stage_runs[stage] if self.stage_runs[stage] else 0.0
+                }
+                for stage in set(self.in_flight) | set(self.stage_runs)
+            }
+            pipeline = [stage for stage in stages if stage not in self.SETUP_STAGES]
+            return {
+                'total': self.total_videos,
+                'started': self.videos_started,
+                'finished': self.videos_finished,
+                'failed': self.videos_failed,
+                'elapsed': elapsed,
+                'videos_per_minute': rate,
+                'eta_seconds': remaining / rate * 60 if rate > 0 else None,
+                'stages': stages,
+                'bottleneck': max(pipeline, key=lambda s: stages[s]['seconds']) if pipeline else None,
+                'errors': {f"{stage}: {error_type}": count for (stage, error_type), count in self.errors.items()}
+            }
+
+    def format_summary(self):
+        """Resumo de uma linha para a barra do tqdm e para a interface."""
+        snap = self.snapshot()
+        if snap['eta_seconds'] is None:
+            eta = "--:--"
+        else:
+            minutes, seconds = divmod(int(snap['eta_seconds']), 60)
+            hours, minutes = divmod(minutes, 60)
+            eta = f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes:02d}:{seconds:02d}"
+        in_flight = " ".join(
+            f"{stage}={info['in_flight']}" for stage, info in sorted(snap['stages'].items()) if info['in_flight']
+        )
+        summary = f"{snap['videos_per_minute']:.1f} vídeos/min | ETA {eta}"
+        if in_flight:
+            summary += f" | em andamento: {in_flight}"
+        if snap['bottleneck']:
+            summary += f" | gargalo: {snap['bottleneck']}"
+        if snap['errors']:
+            summary += f" | erros: {sum(snap['errors'].values())}"
+        return summary
+
+    def render_prometheus(self):
+        """Métricas no formato texto do Prometheus, para o endpoint /metrics."""
+        snap = self.snapshot()
+        lines = [
+            f"transcriber_videos_total {snap['total']}",
+            f"transcriber_videos_started_total {snap['started']}",
+            f"transcriber_videos_finished_total {snap['finished']}",
+            f"transcriber_videos_failed_total {snap['failed']}",
+            f"transcriber_videos_per_minute {snap['videos_per_minute']:.3f}",
+        ]
+        if snap['eta_seconds'] is not None:
+            lines.append(f"transcriber_eta_seconds {snap['eta_seconds']:.0f}")
+        for stage, info in sorted(snap['stages'].items()):
+            lines.append(f'transcriber_stage_in_flight{{stage="{stage}"}} {info["in_flight"]}')
+            lines.append(f'transcriber_stage_seconds_total{{stage="{stage}"}} {info["seconds"]:.3f}')
+            lines.append(f'transcriber_stage_runs_total{{stage="{stage}"}} {info["runs"]}')
+        with self._lock:
+            errors = list(self.errors.items())
+        for (stage, error_type), count in sorted(errors):
+            error_type = error_type.replace('\\', '\\\\').replace('"', '\\"')
+            lines.append(f'transcriber_errors_total{{stage="{stage}",type="{error_type}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    """Responde /metrics (Prometheus) e /metrics.json com as métricas da execução."""
+
+    def do_GET(self):
+        metrics = self.server.metrics
+        if self.path == '/metrics':
+            body = metrics.render_prometheus().encode('utf-8')
+            content_type = 'text/plain; version=0.0.4; charset=utf-8'
+        elif self.path == '/metrics.json':
+            body = json.dumps(metrics.snapshot(), ensure_ascii=False).encode('utf-8')
+            content_type = 'application/json; charset=utf-8'
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def serve_metrics(metrics, port, host='127.0.0.1'):
+    """Expõe as métricas em http://host:port/metrics numa thread em segundo plano."""
+    server = ThreadingHTTPServer((host, port), MetricsRequestHandler)
+    server.daemon_threads = True
+    server.metrics = metrics
+    threading.Thread(target=server.serve_forever, name="MetricsServer", daemon=True).start()
+    return server
+
+class VideoWriter:
+    """Etapa de gravação em thread própria, alimentada por uma fila.
+
+    Cada vídeo é montado em memória, gravado em arquivo temporário e movido
+    para o destino com os.replace, então rede e disco trabalham em paralelo.
+    Com fsync_batch > 0 os arquivos são sincronizados com o disco em lotes
+    antes de aparecerem no destino. Com blob_store, os vídeos vão para o
+    TranscriptBlobStore em vez de arquivos .txt. Com metrics, a etapa
+    'gravacao' (da entrada na fila até o arquivo escrito), cada lote de
+    'fsync' e o fim de cada vídeo são registrados.
+    """
+
+    def __init__(self, channel_folder, include_description, include_comments, fsync_batch=0, max_pending=32, blob_store=None, metrics=None):
+        self.channel_folder = channel_folder
+        self.blob_store = blob_store
+        self.metrics = metrics
+        self.include_description = include_description
+        self.include_comments = include_comments
+        self.fsync_batch = fsync_batch
+        self.results = []
+        self._reported = 0
+        self._results_lock = threading.Lock()
+        self._pending = []
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = threading.Thread(target=self._run, name="VideoWriter", daemon=True)
+        self._thread.start()
+
+    def submit(self, video_id, video_details, transcript_data, comments):
+        """Enfileira um vídeo para gravação (bloqueia se a fila estiver cheia)."""
+        if self.metrics:
+            self.metrics.emit('stage_started', stage='gravacao', video_id=video_id)
+        self._queue.put((video_id, video_details, transcript_data, comments, time.perf_counter()))
+
+    def close(self):
+        """Aguarda a gravação de tudo que foi enfileirado e retorna os resultados.
+
+        Cada resultado é (video_id, video_details, sucesso, erro, status).
+        """
+        self._queue.put(None)
+        self._thread.join()
+        return self.results
+
+    def poll_results(self):
+        """Retorna os resultados concluídos desde a última chamada, para acompanhar a gravação durante a execução."""
+        with self._results_lock:
+            new_results = self.results[self._reported:]
+            self._reported = len(self.results)
+        return new_results
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._flush()
+                break
+            self._write(*item)
+            if self.fsync_batch and len(self._pending) >= self.fsync_batch:
+                self._flush()
+
+    def _end_stage(self, video_id, queued_at):
+        """Encerra a etapa 'gravacao' do vídeo: espera na fila + montagem + escrita."""
+        if self.metrics:
+            self.metrics.emit('stage_finished', stage='gravacao', video_id=video_id, duration=time.perf_counter() - queued_at)
+
+    def _record(self, video_id, video_details, status=None, exception=None):
+        """Guarda o resultado do vídeo e marca o vídeo como concluído nas métricas."""
+        with self._results_lock:
+            if exception is None:
+                self.results.append((video_id, video_details, True, "Sucesso", status))
+            else:
+                self.results.append((video_id, video_details, False, str(exception), None))
+        if self.metrics:
+            if exception is not None:
+                self.metrics.error('gravacao', exception)
+            self.metrics.emit(
+                'video_finished',
+                video_id=video_id,
+                success=exception is None,
+                status=status if exception is None else None
+            )
+
+    def _write(self, video_id, video_details, transcript_data, comments, queued_at):
+        status = "Com Transcrição" if transcript_data else "Sem Transcrição"
+        temp_path = None
+        exception = None
+        try:
+            if self.blob_store:
+                self.blob_store.put_video(
+                    video_id,
+                    video_details,
+                    transcript_data,
+                    comments,
+                    self.include_description,
+                    self.include_comments
+                )
+            else:
+                status, output_file = get_video_output_path(video_details, self.channel_folder, bool(transcript_data))
+                content = render_video_content(
+                    video_id,
+                    video_details,
+                    transcript_data,
+                    comments,
+                    self.include_description,
+                    self.include_comments
+                )
+                if self.fsync_batch:
+                    temp_path = write_temp_file(output_file, content)
+                else:
+                    write_file_atomic(output_file, content)
+        except Exception as e:
+            exception = e
+
+        # Métricas e resultado ficam fora do try: cada vídeo é registrado uma única vez
+        self._end_stage(video_id, queued_at)
+        if temp_path:
+            # O vídeo só é publicado no _flush; a espera pelo lote não conta como gravação
+            self._pending.append((temp_path, output_file, video_id, video_details, status))
+        else:
+            self._record(video_id, video_details, status, exception)
+
+    def _flush(self):
+        """Sincroniza o lote pendente com o disco e move os arquivos para o destino."""
+        if not self._pending:
+            return
+        started = time.perf_counter()
+        if self.metrics:
+            self.metrics.emit('stage_started', stage='fsync', files=len(self._pending))
+        directories = set()
+        for temp_path, output_file, video_id, video_details, status in self._pending:
+            exception = None
+            try:
+                with open(temp_path, 'rb+') as f:
+                    os.fsync(f.fileno())
+                os.replace(temp_path, output_file)
+                directories.add(os.path.dirname(output_file))
+            except Exception as e:
+                exception = e
+            self._record(video_id, video_details, status, exception)
+        for directory in directories:
+            fsync_directory(directory)
+        if self.metrics:
+            self.metrics.emit('stage_finished', stage='fsync', files=len(self._pending), duration=time.perf_counter() - started)
+        self._pending = []
+
+SNAPSHOT_DB_NAME = "snapshots.sqlite3"
+
+def open_snapshot_store(output_dir):
+    """Abre (ou cria) o histórico de estatísticas do canal em SQLite."""
+    conn = sqlite3.connect(os.path.join(output_dir, SNAPSHOT_DB_NAME))
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS videos (
+            id INTEGER PRIMARY KEY,
+            video_id TEXT NOT NULL UNIQUE,
+            title TEXT,
+            publish_date TEXT
+        );
+        CREATE TABLE IF NOT EXISTS snapshots (
+            video INTEGER NOT NULL,
+            captured_at INTEGER NOT NULL,
+            views INTEGER NOT NULL,
+            likes INTEGER NOT NULL,
+            comments INTEGER NOT NULL,
+            PRIMARY KEY (video, captured_at)
+        ) WITHOUT ROWID;
+    """)
+    return conn
+
+def save_video_snapshots(video_details_list, output_dir, captured_at=None):
+    """Acrescenta ao histórico uma linha de estatísticas por vídeo desta execução."""
+    if captured_at is None:
+        captured_at = int(time.time())
+    try:
+        conn = open_snapshot_store(output_dir)
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT INTO videos (video_id, title, publish_date) VALUES (?, ?, ?) "
+                    "ON CONFLICT(video_id) DO UPDATE SET title = excluded.title",
+                    [(v['video_id'], v['title'], v['publish_date']) for v in video_details_list]
+                )
+                keys = dict(conn.execute("SELECT video_id, id FROM videos"))
+                conn.executemany(
+                    "INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (keys[v['video_id']], captured_at, int(v['views']), int(v['likes']), int(v['comments_count']))
+                        for v in video_details_list
+                    ]
+                )
+            return len(video_details_list)
+        finally:
+            conn.close()
+    except Exception as e:
+        print(f"Erro ao salvar histórico de estatísticas: {str(e)}")
+        return 0
+
+SNAPSHOT_READ_CHUNK = 100000
+
+def load_snapshot_arrays(conn):
+    """Carrega o histórico em colunas (vídeo, momento, views) ordenadas por vídeo e momento."""
+    cursor = conn.execute("SELECT video, captured_at, views FROM snapshots ORDER BY video, captured_at")
+    if np is not None:
+        total = conn.execute("SELECT COUNT(*) FROM snapshots").fetchone()[0]
+        data = np.empty((total, 3), dtype=np.int64)
+        filled = 0
+        while True:
+            rows = cursor.fetchmany(SNAPSHOT_READ_CHUNK)
+            if not rows:
+                break
+            chunk = np.fromiter(itertools.chain.from_iterable(rows), dtype=np.int64, count=len(rows) * 3)
+            data[filled:filled + len(rows)] = chunk.reshape(-1, 3)
+            filled += len(rows)
+        data = data[:filled]
+        return data[:, 0], data[:, 1], data[:, 2]
+    rows = cursor.fetchall()
+    return [r[0] for r in rows], [r[1] for r in rows], [r[2] for r in rows]
+
+def compute_view_velocity(video, captured_at, views):
+    """Calcula views ganhas e views/dia de cada vídeo entre o primeiro e o último snapshot.
+
+    Só entram vídeos com pelo menos dois snapshots em momentos distintos.
+    """
+    if np is not None:
+        n = len(video)
+        if n == 0:
+            return video, np.empty(0), views
+        starts = np.flatnonzero(np.r_[True, video[1:] != video[:-1]])
+        ends = np.r_[starts[1:], n] - 1
+        elapsed = captured_at[ends] - captured_at[starts]
+        mask = elapsed > 0
+        starts, ends, elapsed = starts[mask], ends[mask], elapsed[mask]
+        gained = views[ends] - views[starts]
+        return video[starts], gained * 86400.0 / elapsed, gained
+
+    keys, velocity, gained = [], [], []
+    start = 0
+    for i in range(1, len(video) + 1):
+        if i == len(video) or video[i] != video[start]:
+            elapsed = captured_at[i - 1] - captured_at[start]
+            if elapsed > 0:
+                keys.append(video[start])
+                gained.append(views[i - 1] - views[start])
+                velocity.append(gained[-1] * 86400.0 / elapsed)
+            start = i
+    return keys, velocity, gained
+
+def compute_latest_gain(video, captured_at, views):
+    """Calcula views ganhas e views/dia de cada vídeo no intervalo entre os dois últimos snapshots."""
+    if np is not None:
+        n = len(video)
+        if n < 2:
+            return video[:0], np.empty(0), views[:0]
+        ends = np.flatnonzero(np.r_[video[1:] != video[:-1], True])
+        ends = ends[ends > 0]
+        ends = ends[video[ends - 1] == video[ends]]
+        elapsed = captured_at[ends] - captured_at[ends - 1]
+        mask = elapsed > 0
+        ends, elapsed = ends[mask], elapsed[mask]
+        gained = views[ends] - views[ends - 1]
+        return video[ends], gained * 86400.0 / elapsed, gained
+
+    keys, velocity, gained = [], [], []
+    for i in range(1, len(video)):
+        is_last = i == len(video) - 1 or video[i + 1] != video[i]
+        if is_last and video[i - 1] == video[i] and captured_at[i] > captured_at[i - 1]:
+            keys.append(video[i])
+            gained.append(views[i] - views[i - 1])
+            velocity.append(gained[-1] * 86400.0 / (captured_at[i] - captured_at[i - 1]))
+    return keys, velocity, gained
+
+def compute_growth_curve(video, captured_at, views):
+    """Acumula, execução a execução, as views ganhas pelos vídeos presentes nas duas execuções consecutivas.
+
+    Vídeos novos ou ausentes em uma execução não aparecem como crescimento ou queda.
+    """
+    if np is not None:
+        moments, run = np.unique(captured_at, return_inverse=True)
+        pairs = np.flatnonzero((video[1:] == video[:-1]) & (run[1:] == run[:-1] + 1))
+        gains = np.bincount(run[pairs + 1], weights=views[pairs + 1] - views[pairs], minlength=len(moments))
+        return [(int(m), int(t)) for m, t in zip(moments, np.cumsum(gains))]
+
+    moments = sorted(set(captured_at))
+    run = {moment: i for i, moment in enumerate(moments)}
+    gains = [0] * len(moments)
+    for i in range(1, len(video)):
+        if video[i] == video[i - 1] and run[captured_at[i]] == run[captured_at[i - 1]] + 1:
+            gains[run[captured_at[i]]] += views[i] - views[i - 1]
+    return list(zip(moments, itertools.accumulate(gains)))
+
+def analyze_snapshots(output_dir, top_n=10):
+    """Gera velocidade de views, curva de crescimento, maiores altas e cadência mensal."""
+    db_path = os.path.join(output_dir, SNAPSHOT_DB_NAME)
+    if not os.path.exists(db_path):
+        return None
+    try:
+        conn = open_snapshot_store(output_dir)
+        try:
+            video, captured_at, views = load_snapshot_arrays(conn)
+            if len(video) == 0:
+                return None
+
+            growth = compute_growth_curve(video, captured_at, views)
+            keys, velocity, _ = compute_view_velocity(video, captured_at, views)
+
+            # Soma das velocidades dos vídeos com pelo menos dois snapshots: vídeos
+            # novos ou ausentes em uma execução não contam como ganho ou perda.
+            if not len(keys):
+                channel_velocity = None
+            elif np is not None:
+                channel_velocity = float(velocity.sum())
+            else:
+                channel_velocity = float(sum(velocity))
+
+            # Vídeos em alta: ritmo no intervalo mais recente de cada vídeo
+            keys, velocity, gained = compute_latest_gain(video, captured_at, views)
+            if np is not None:
+                order = np.argsort(-velocity, kind='stable')[:top_n]
+                risers = [(int(keys[i]), float(velocity[i]), int(gained[i])) for i in order]
+            else:
+                order = sorted(range(len(keys)), key=lambda i: -velocity[i])[:top_n]
+                risers = [(keys[i], velocity[i], gained[i]) for i in order]
+
+            titles = dict(conn.execute("SELECT id, title FROM videos"))
+            top_risers = [(titles.get(key, ''), vel, gain) for key, vel, gain in risers]
+
+            cadence = conn.execute(
+                "SELECT substr(publish_date, 1, 7) AS month, COUNT(*) FROM videos "
+                "GROUP BY month ORDER BY month"
+            ).fetchall()
+        finally:
+            conn.close()
+
+        return {
+            'runs': len(growth),
+            'growth': growth,
+            'channel_velocity': channel_velocity,
+            'top_risers': top_risers,
+            'cadence': cadence
+        }
+    except Exception as e:
+        print(f"Erro ao analisar histórico de estatísticas: {str(e)}")
+        return None
     
 def generate_channel_analysis(video_details_list, channel_name, sucessos_com_transcricao, sucessos_sem_transcricao, output_dir):
     """Gera um relatório detalhado de análise do canal em formato Markdown."""
@@ -386,13 +1438,46 @@ def generate_channel_analysis(video_details_list, channel_name, sucessos_com_tra
         
         report += "```\n"
         
+        # Adiciona tendências a partir do histórico de snapshots
+        trends = analyze_snapshots(output_dir)
+        if trends:
+            report += f"\n## 📈 Tendências\n\n- Execuções registradas no histórico: **{trends['runs']}**\n"
+            if trends['channel_velocity'] is not None:
+                report += f"- Velocidade do canal: **{trends['channel_velocity']:,.0f}** views por dia\n"
+            
+            report += "\n### 📈 Curva de Crescimento (views ganhas desde a primeira execução)\n```\n"
+            growth = trends['growth'][-12:]
+            max_total = max(max(total for _, total in growth), 1)
+            for moment, total in growth:
+                bar_length = int((total / max_total) * 50)
+                report += f"{datetime.fromtimestamp(moment).strftime('%Y-%m-%d %H:%M')} | {'█' * bar_length} {total:,}\n"
+            report += "```\n"
+            
+            if trends['top_risers']:
+                report += "\n### 🚀 Vídeos em Alta (views por dia no último intervalo)\n"
+                for title, velocity, gained in trends['top_risers']:
+                    report += f"- {title}: {velocity:,.0f} views/dia (+{gained:,} desde a execução anterior)\n"
+            
+            report += "\n### 🗓️ Cadência Mensal de Postagem\n```\n"
+            cadence = trends['cadence'][-12:]
+            max_month = max(count for _, count in cadence) or 1
+            for month, count in cadence:
+                bar_length = int((count / max_month) * 50)
+                report += f"{month} | {'█' * bar_length} {count}\n"
+            report += "```\n"
+        
+        if trends and trends['channel_velocity'] is not None:
+            audience_insight = f"O canal ganhou em média {trends['channel_velocity']:,.0f} visualizações por dia entre as execuções registradas"
+        else:
+            audience_insight = f"Média de {int(avg_views):,} visualizações por vídeo (execute novamente para medir a evolução da audiência)"
+        
         # Adiciona insights finais
         report += f"""
 ## 💡 Insights
 
 1. **Crescimento do Canal** 🚀
    - O canal tem mantido uma presença ativa por {days_between//365} anos e {(days_between%365)//30} meses
-   - Média de {int(avg_views):,} visualizações por vídeo demonstra uma audiência consistente
+   - {audience_insight}
 
 2. **Engajamento da Audiência** 👥
    - Taxa média de {(avg_likes/avg_views)*100:.2f}% de likes por visualização
@@ -421,7 +1506,100 @@ def generate_channel_analysis(video_details_list, channel_name, sucessos_com_tra
         print(f"Erro ao gerar análise do canal: {str(e)}")
         return False
 
+def positive_int(value):
+    """Tipo do argparse para inteiros maiores que zero."""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"número inteiro inválido: {value}")
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"o valor deve ser maior que zero: {value}")
+    return number
+
+def non_negative_int(value):
+    """Tipo do argparse para inteiros maiores ou iguais a zero."""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"número inteiro inválido: {value}")
+    if number < 0:
+        raise argparse.ArgumentTypeError(f"o valor não pode ser negativo: {value}")
+    return number
+
+def date_arg(value):
+    """Tipo do argparse para datas AAAA-MM-DD (comparadas como texto com publish_date)."""
+    from datetime import datetime
+    try:
+        datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"data inválida (use AAAA-MM-DD): {value}")
+    return value
+
+def regex_arg(value):
+    """Tipo do argparse que valida a expressão regular antes de qualquer chamada à API."""
+    try:
+        re.compile(value)
+    except re.error as e:
+        raise argparse.ArgumentTypeError(f"expressão regular inválida: {e}")
+    return value
+
+def parse_args():
+    """Lê as opções de seleção e prioridade da linha de comando."""
+    parser = argparse.ArgumentParser(description="Salva transcrições e comentários dos vídeos de um canal do YouTube.")
+    parser.add_argument('--max-videos', type=positive_int, help="processa no máximo N vídeos")
+    parser.add_argument('--quota', type=non_negative_int, help="cota da API disponível para esta execução (unidades)")
+    parser.add_argument('--desde', type=date_arg, help="só vídeos publicados a partir desta data (AAAA-MM-DD)")
+    parser.add_argument('--ate', type=date_arg, help="só vídeos publicados até esta data (AAAA-MM-DD)")
+    parser.add_argument('--min-views', type=non_negative_int, help="só vídeos com pelo menos N visualizações")
+    parser.add_argument('--min-duracao', type=non_negative_int, help="duração mínima em segundos")
+    parser.add_argument('--max-duracao', type=non_negative_int, help="duração máxima em segundos")
+    parser.add_argument('--shorts', choices=['apenas', 'excluir'], help="mantém apenas ou exclui os shorts")
+    parser.add_argument('--titulo', type=regex_arg, help="expressão regular que o título deve conter")
+    parser.add_argument('--ordem', choices=['views', 'recentes'], help="processa primeiro os mais vistos ou os mais recentes")
+    parser.add_argument('--armazenamento', choices=['txt', 'blobs'], default='txt',
+                        help="salva arquivos .txt ou no armazenamento comprimido com deduplicação")
+    parser.add_argument('--materializar', metavar='PASTA_DO_CANAL',
+                        help="gera os arquivos .txt a partir do armazenamento comprimido da pasta e sai")
+    parser.add_argument('--fsync-lote', type=non_negative_int, default=0, metavar='N',
+                        help="sincroniza os arquivos com o disco (fsync) em lotes de N antes de publicá-los")
+    parser.add_argument('--metrics-porta', type=positive_int, metavar='PORTA',
+                        help="expõe métricas de progresso em http://127.0.0.1:PORTA/metrics")
+    parser.add_argument('--eventos', metavar='ARQUIVO',
+                        help="grava os eventos de progresso em JSON Lines neste arquivo")
+    return parser.parse_args()
+
 def main():
+    args = parse_args()
+    
+    if args.materializar:
+        store_dir = os.path.join(args.materializar, BLOB_STORE_DIR)
+        if not TranscriptBlobStore.exists(store_dir):
+            print(f"Erro: armazenamento comprimido não encontrado em: {store_dir}")
+            sys.exit(1)
+        store = TranscriptBlobStore(store_dir)
+        try:
+            total = store.materialize(args.materializar)
+        finally:
+            store.close()
+        print(f"{total} arquivos gerados em: {args.materializar}")
+        return
+    
+    # Métricas de progresso: o log de eventos e a porta do /metrics são abertos
+    # antes das perguntas e das chamadas à API, para falharem logo
+    try:
+        metrics = ProgressMetrics(0, event_log=args.eventos)
+    except OSError as e:
+        print(f"Erro: não foi possível abrir o arquivo de eventos {args.eventos}: {e.strerror or e}")
+        sys.exit(1)
+    if args.metrics_porta:
+        try:
+            serve_metrics(metrics, args.metrics_porta)
+        except OSError as e:
+            print(f"Erro: não foi possível usar a porta {args.metrics_porta} para as métricas: {e.strerror or e}")
+            metrics.close()
+            sys.exit(1)
+        print(f"Métricas disponíveis em: http://127.0.0.1:{args.metrics_porta}/metrics")
+    
     API_KEY = 'SUA API KEY AQUI'
     youtube = check_api_key(API_KEY)
     
@@ -463,12 +1641,56 @@ def main():
     
     # Cria estrutura de pastas
     os.makedirs(output_dir, exist_ok=True)
-    os.makedirs(os.path.join(output_dir, "Com Transcrição"), exist_ok=True)
-    os.makedirs(os.path.join(output_dir, "Sem Transcrição"), exist_ok=True)
+    if args.armazenamento == 'txt':
+        os.makedirs(os.path.join(output_dir, "Com Transcrição"), exist_ok=True)
+        os.makedirs(os.path.join(output_dir, "Sem Transcrição"), exist_ok=True)
+    
+    # Obtém vídeos e seus detalhes em lote
+    with metrics.stage('listagem'):
+        video_ids = get_video_ids(youtube, channel_id, metrics=metrics)
+    with metrics.stage('detalhes'):
+        fetched_details = get_videos_details(youtube, video_ids, metrics=metrics)
+    
+    if not fetched_details:
+        print("Não foi possível obter a lista ou os detalhes dos vídeos do canal. Nada a processar.")
+        metrics.close()
+        return
     
-    # Obtém e processa vídeos
-    videos = get_video_ids(youtube, channel_id)
+    # Registra o snapshot de estatísticas desta execução (todos os vídeos listados)
+    save_video_snapshots(fetched_details, output_dir)
+    
+    # Seleciona e prioriza antes das etapas caras
+    max_videos = args.max_videos
+    quota_limit = videos_within_quota(args.quota, len(video_ids), include_comments)
+    if args.quota is not None and not include_comments:
+        print("Aviso: --quota ignorada; sem comentários, as etapas seguintes não consomem cota da API.")
+    if quota_limit is not None:
+        print(f"Cota disponível permite processar até {quota_limit} vídeos com comentários.")
+        if quota_limit == 0:
+            print("A cota informada já foi consumida pela listagem e pelos detalhes dos vídeos. Nada a processar.")
+            metrics.close()
+            return
+        max_videos = quota_limit if max_videos is None else min(max_videos, quota_limit)
+    
+    videos = select_videos(
+        fetched_details,
+        date_from=args.desde,
+        date_to=args.ate,
+        min_views=args.min_views,
+        min_duration=args.min_duracao,
+        max_duration=args.max_duracao,
+        shorts=args.shorts,
+        title_regex=args.titulo,
+        order_by=args.ordem,
+        max_videos=max_videos
+    )
     total_videos = len(videos)
+    print(f"Vídeos selecionados para processamento: {total_videos} de {len(fetched_details)}")
+    if not videos:
+        print("Nenhum vídeo atende aos filtros escolhidos.")
+        metrics.close()
+        return
+    metrics.set_total(total_videos)
     
     # Lista para armazenar detalhes de todos os vídeos
     all_video_details = []
@@ -479,46 +1701,79 @@ def main():
     falhas = 0
     erros = {}
     
+    # Grava os arquivos em paralelo com as chamadas de rede
+    blob_store = None
+    if args.armazenamento == 'blobs':
+        blob_store = TranscriptBlobStore(os.path.join(output_dir, BLOB_STORE_DIR))
+    
+    writer = VideoWriter(
+        output_dir,
+        include_description,
+        include_comments,
+        fsync_batch=args.fsync_lote,
+        blob_store=blob_store,
+        metrics=metrics
+    )
+
     print("\nProcessando vídeos...")
-    for video_id in tqdm(videos, desc="Progresso", unit="vídeo"):
+    progress = tqdm(videos, desc="Progresso", unit="vídeo")
+    for video_details in progress:
+        video_id = video_details['video_id']
+        metrics.emit('video_started', video_id=video_id)
         try:
-            video_details = get_video_details(youtube, video_id)
-            if not video_details:
-                continue
-            
             # Adiciona à lista de detalhes
             all_video_details.append(video_details)
-            
-            comments = get_video_comments(youtube, video_id) if include_comments else []
-            
-            success, error, status = save_video_content(
-                video_id,
-                video_details,
-                comments,
-                output_dir,
-                include_description,
-                include_comments
-            )
-            
-            if success:
-                if status == "Com Transcrição":
-                    sucessos_com_transcricao += 1
-                else:
-                    sucessos_sem_transcricao += 1
-            else:
-                falhas += 1
-                print(f"\nErro no vídeo {video_details['title']}: {error}")
-                
-                if error not in erros:
-                    erros[error] = 0
-                erros[error] += 1
-            
+
+            # O resumo é atualizado ao entrar em cada etapa, para mostrar onde o vídeo está
+            comments = []
+            if include_comments:
+                with metrics.stage('comentarios', video_id=video_id):
+                    progress.set_postfix_str(metrics.format_summary())
+                    comments = get_video_comments(youtube, video_id, metrics=metrics)
+            with metrics.stage('transcricao', video_id=video_id):
+                progress.set_postfix_str(metrics.format_summary())
+                transcript_data = get_transcript(video_id, metrics=metrics)
+
+            writer.submit(video_id, video_details, transcript_data, comments)
+
         except Exception as e:
             falhas += 1
+            metrics.emit('video_finished', video_id=video_id, success=False)
             print(f"\nErro inesperado no vídeo {video_id}: {str(e)}")
-        
+
+        for _, failed_details, success, error, _ in writer.poll_results():
+            if not success:
+                progress.write(f"Erro ao gravar o vídeo {failed_details['title']}: {error}")
+
+        progress.set_postfix_str(metrics.format_summary())
         time.sleep(0.5)
-    
+
+    print("\nFinalizando gravação dos arquivos...")
+    results = writer.close()
+    for _, failed_details, success, error, _ in writer.poll_results():
+        if not success:
+            print(f"Erro ao gravar o vídeo {failed_details['title']}: {error}")
+
+    for video_id, video_details, success, error, status in results:
+        if success:
+            if status == "Com Transcrição":
+                sucessos_com_transcricao += 1
+            else:
+                sucessos_sem_transcricao += 1
+        else:
+            falhas += 1
+            if error not in erros:
+                erros[error] = 0
+            erros[error] += 1
+
+    if blob_store:
+        removed, freed = blob_store.compact(min_dead_ratio=BLOB_COMPACT_RATIO)
+        if removed:
+            print(f"Compactação: {removed} blobs sem uso removidos ({freed / 1024 / 1024:.1f} MB liberados)")
+        blob_count, blob_bytes = blob_store.disk_usage()
+        blob_store.close()
+        print(f"Armazenamento comprimido: {blob_count} blobs, {blob_bytes / 1024 / 1024:.1f} MB")
+
     # Gera análise detalhada do canal
     print("\nGerando análise detalhada do canal...")
     generate_channel_analysis(
@@ -544,9 +1799,24 @@ def main():
         for erro, quantidade in erros.items():
             print(f"- {erro}: {quantidade} vídeos")
     
+    snap = metrics.snapshot()
+    metrics.close()
+    print(f"\nVazão: {snap['videos_per_minute']:.1f} vídeos/min em {snap['elapsed'] / 60:.1f} min")
+    print("Tempo por etapa:")
+    for stage, info in sorted(snap['stages'].items(), key=lambda item: -item[1]['seconds']):
+        print(f"- {stage}: {info['seconds']:.1f}s no total, {info['average']:.2f}s por execução ({info['runs']} execuções)")
+    if snap['errors']:
+        print("Erros por etapa e tipo:")
+        for error_type, quantidade in snap['errors'].items():
+            print(f"- {error_type}: {quantidade}")
+    
     print(f"\nArquivos salvos em: {output_dir}")
-    print(f"- Vídeos com transcrição: {os.path.join(output_dir, 'Com Transcrição')}")
-    print(f"- Vídeos sem transcrição: {os.path.join(output_dir, 'Sem Transcrição')}")
+    if blob_store:
+        print(f"- Transcrições comprimidas: {os.path.join(output_dir, BLOB_STORE_DIR)}")
+        print(f"  (gere os .txt com: python robo.py --materializar \"{output_dir}\")")
+    else:
+        print(f"- Vídeos com transcrição: {os.path.join(output_dir, 'Com Transcrição')}")
+        print(f"- Vídeos sem transcrição: {os.path.join(output_dir, 'Sem Transcrição')}")
     print(f"- Análise detalhada: {os.path.join(output_dir, f'{channel_name}_analise.md')}")
 
 if __name__ == "__main__":